@@ -0,0 +1,54 @@
+# database.py
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./video_db.sqlite3")
+
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+    # SQLite ignores FK constraints (and ON DELETE CASCADE) unless the
+    # pragma is enabled on every connection.
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+else:
+    # Sized for FastAPI's threadpool: the default 5-connection pool
+    # serializes concurrent requests, and without pre-ping a connection
+    # dropped by the server surfaces as a request error.
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=20,
+        max_overflow=40,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for the endpoints that await the database directly; the
+# sync engine stays for background tasks and the remaining sync routes.
+if DATABASE_URL.startswith("sqlite"):
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite", "sqlite+aiosqlite", 1)
+elif DATABASE_URL.startswith("postgresql"):
+    ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql", "postgresql+asyncpg", 1)
+else:
+    ASYNC_DATABASE_URL = DATABASE_URL
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession,
+    autocommit=False, autoflush=False, expire_on_commit=False
+)
+
+Base = declarative_base()
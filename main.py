@@ -1,557 +1,980 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-import subprocess, os, json, shutil, uuid
-from pathlib import Path
-from typing import List, Optional
-from pydantic import BaseModel
-
-import crud, models, database
-from database import SessionLocal, engine, Base
-
-# ==========================
-# DB setup
-# ==========================
-# Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
-
-# ==========================
-# FastAPI app
-# ==========================
-app = FastAPI()
-
-# ==========================
-# FFmpeg paths
-# ==========================
-FFMPEG_PATH = r"C:\Users\VICTUS\ffmpeg\ffmpeg.exe"
-FFPROBE_PATH = r"C:\Users\VICTUS\ffmpeg\ffprobe.exe"
-
-# ==========================
-# Directories
-# ==========================
-TEMP_DIR = "./temp_uploads"
-PROCESSED_DIR = "./processed"
-QUALITIES_DIR = "./qualities"  # NEW: Directory for quality versions
-Path(TEMP_DIR).mkdir(parents=True, exist_ok=True)
-Path(PROCESSED_DIR).mkdir(parents=True, exist_ok=True)
-Path(QUALITIES_DIR).mkdir(parents=True, exist_ok=True)  # NEW
-
-# ==========================
-# NEW: Pydantic Models for Video Quality
-# ==========================
-class QualityGenerationRequest(BaseModel):
-    qualities: List[str] = ["1080p", "720p", "480p"]
-
-class VideoQualityResponse(BaseModel):
-    id: int
-    video_id: int
-    quality: str
-    filename: str
-    bitrate: Optional[str]
-    resolution: Optional[str]
-    filesize: Optional[int]
-
-# ==========================
-# DB dependency
-# ==========================
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# ==========================
-# NEW: Video Quality Processing Functions
-# ==========================
-def get_video_metadata(video_path: str) -> dict:
-    """Get video metadata using ffprobe"""
-    cmd = [
-        FFPROBE_PATH, "-v", "error", 
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height,bit_rate:format=duration,size,bit_rate",
-        "-of", "json", video_path
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return json.loads(result.stdout)
-
-def generate_video_quality(input_path: str, output_path: str, quality: str) -> dict:
-    """Generate a specific quality version of a video"""
-    quality_settings = {
-        "1080p": {"resolution": "1920x1080", "bitrate": "5000k", "crf": "23"},
-        "720p": {"resolution": "1280x720", "bitrate": "2500k", "crf": "25"},
-        "480p": {"resolution": "854x480", "bitrate": "1000k", "crf": "28"},
-    }
-    
-    if quality not in quality_settings:
-        raise ValueError(f"Unsupported quality: {quality}")
-    
-    settings = quality_settings[quality]
-    
-    cmd = [
-        FFMPEG_PATH, "-i", input_path,
-        "-vf", f"scale={settings['resolution']}",
-        "-b:v", settings["bitrate"],
-        "-crf", settings["crf"],
-        "-preset", "fast",
-        "-c:a", "aac", "-b:a", "128k",
-        output_path
-    ]
-    
-    subprocess.run(cmd, capture_output=True, text=True, check=True)
-    
-    # Get metadata of generated file
-    metadata = get_video_metadata(output_path)
-    filesize = os.path.getsize(output_path)
-    
-    return {
-        "resolution": settings["resolution"],
-        "bitrate": settings["bitrate"],
-        "filesize": filesize
-    }
-
-def process_video_qualities(video_id: int, original_filename: str, qualities: List[str], db: Session):
-    """Background task to process video qualities"""
-    try:
-        input_path = os.path.join(TEMP_DIR, original_filename)
-        qualities_data = []
-        
-        for quality in qualities:
-            output_filename = f"{quality}_{uuid.uuid4().hex}.mp4"
-            output_path = os.path.join(QUALITIES_DIR, output_filename)
-            
-            try:
-                metadata = generate_video_quality(input_path, output_path, quality)
-                qualities_data.append({
-                    "quality": quality,
-                    "filename": output_filename,
-                    "bitrate": metadata["bitrate"],
-                    "resolution": metadata["resolution"],
-                    "filesize": metadata["filesize"]
-                })
-            except Exception as e:
-                print(f"Failed to generate {quality} for video {video_id}: {str(e)}")
-                continue
-        
-        # Save to database
-        if qualities_data:
-            crud.create_multiple_video_qualities(db, video_id, qualities_data)
-            print(f"Successfully generated {len(qualities_data)} quality versions for video {video_id}")
-    
-    except Exception as e:
-        print(f"Error processing qualities for video {video_id}: {str(e)}")
-
-# ==========================
-# Cleanup database
-# ==========================
-def cleanup_database():
-    db = SessionLocal()
-    try:
-        videos = db.query(models.Video).all()
-        for video in videos:
-            current_path = os.path.join(TEMP_DIR, video.filename)
-            if not os.path.exists(current_path):
-                for file in os.listdir(TEMP_DIR):
-                    if file.endswith(video.filename) or video.filename in file:
-                        video.filename = file
-                        break
-        db.commit()
-    except Exception as e:
-        print(f"Cleanup error: {e}")
-    finally:
-        db.close()
-
-cleanup_database()
-
-# ==========================
-# Root
-# ==========================
-@app.get("/")
-def root():
-    return {"msg": "Video API is running 🚀"}
-
-# ==========================
-# Upload video
-# ==========================
-@app.post("/upload")
-async def upload(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    if not file.content_type.startswith("video/"):
-        raise HTTPException(400, detail="File must be a video")
-    try:
-        unique_filename = f"{uuid.uuid4().hex}_{file.filename}"
-        file_path = os.path.join(TEMP_DIR, unique_filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        cmd = [FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration,size", "-of", "json", file_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        metadata = json.loads(result.stdout)["format"]
-        duration = float(metadata.get("duration", 0))
-        size = int(metadata.get("size", 0))
-
-        db_video = crud.create_video(db, filename=unique_filename, duration=duration, size=size)
-        return {"id": db_video.id, "filename": file.filename, "stored_filename": unique_filename, "duration": duration, "size": size}
-    except Exception as e:
-        raise HTTPException(500, detail=str(e))
-
-# ==========================
-# List videos
-# ==========================
-@app.get("/videos")
-def list_videos(db: Session = Depends(get_db)):
-    videos = crud.get_videos(db)
-    return [
-        {
-            "id": video.id,
-            "filename": video.filename,
-            "original_filename": video.filename.split('_', 1)[1] if '_' in video.filename else video.filename,
-            "duration": video.duration,
-            "size": video.size,
-            "upload_time": video.upload_time
-        }
-        for video in videos
-    ]
-
-# ==========================
-# NEW: Video Quality Endpoints
-# ==========================
-
-@app.post("/videos/{video_id}/qualities/generate")
-async def generate_video_qualities(
-    video_id: int,
-    request: QualityGenerationRequest,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
-):
-    """Generate multiple quality versions of a video"""
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    input_path = os.path.join(TEMP_DIR, video.filename)
-    if not os.path.exists(input_path):
-        raise HTTPException(status_code=404, detail="Video file not found on server")
-    
-    # Check if qualities already exist
-    existing_qualities = crud.get_available_qualities(db, video_id)
-    new_qualities = [q for q in request.qualities if q not in existing_qualities]
-    
-    if not new_qualities:
-        return {"message": "All requested qualities already exist", "existing_qualities": existing_qualities}
-    
-    # Start background processing
-    background_tasks.add_task(process_video_qualities, video_id, video.filename, new_qualities, db)
-    
-    return {
-        "message": f"Started generating {len(new_qualities)} quality versions",
-        "video_id": video_id,
-        "requested_qualities": new_qualities,
-        "existing_qualities": existing_qualities
-    }
-
-@app.get("/videos/{video_id}/qualities")
-def get_video_qualities(video_id: int, db: Session = Depends(get_db)):
-    """Get all available quality versions for a video"""
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    qualities = crud.get_video_qualities(db, video_id)
-    return {
-        "video_id": video_id,
-        "original_filename": video.filename,
-        "available_qualities": [
-            {
-                "id": q.id,
-                "quality": q.quality,
-                "filename": q.filename,
-                "bitrate": q.bitrate,
-                "resolution": q.resolution,
-                "filesize": q.filesize,
-                "created_time": q.created_time
-            }
-            for q in qualities
-        ]
-    }
-
-@app.get("/videos/{video_id}/qualities/{quality}")
-def get_specific_quality(video_id: int, quality: str, db: Session = Depends(get_db)):
-    """Get information about a specific quality version"""
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    quality_info = crud.get_video_by_quality(db, video_id, quality)
-    if not quality_info:
-        raise HTTPException(status_code=404, detail=f"Quality '{quality}' not found for this video")
-    
-    return {
-        "id": quality_info.id,
-        "video_id": video_id,
-        "quality": quality_info.quality,
-        "filename": quality_info.filename,
-        "bitrate": quality_info.bitrate,
-        "resolution": quality_info.resolution,
-        "filesize": quality_info.filesize,
-        "created_time": quality_info.created_time
-    }
-
-@app.get("/videos/{video_id}/download/{quality}")
-def download_quality(video_id: int, quality: str, db: Session = Depends(get_db)):
-    """Download a specific quality version of a video"""
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    quality_info = crud.get_video_by_quality(db, video_id, quality)
-    if not quality_info:
-        raise HTTPException(status_code=404, detail=f"Quality '{quality}' not found for this video")
-    
-    file_path = os.path.join(QUALITIES_DIR, quality_info.filename)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Quality file not found on server")
-    
-    # Generate a user-friendly filename
-    original_name = video.filename.split('_', 1)[1] if '_' in video.filename else video.filename
-    download_name = f"{original_name.rsplit('.', 1)[0]}_{quality}.mp4"
-    
-    return FileResponse(
-        path=file_path,
-        filename=download_name,
-        media_type="video/mp4"
-    )
-
-@app.get("/videos/{video_id}/stats")
-def get_video_stats(video_id: int, db: Session = Depends(get_db)):
-    """Get comprehensive statistics for a video"""
-    stats = crud.get_video_stats(db, video_id)
-    if not stats:
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    return stats
-
-@app.delete("/videos/{video_id}/qualities/{quality_id}")
-def delete_video_quality(video_id: int, quality_id: int, db: Session = Depends(get_db)):
-    """Delete a specific quality version"""
-    quality_info = crud.get_quality_by_id(db, quality_id)
-    if not quality_info or quality_info.video_id != video_id:
-        raise HTTPException(status_code=404, detail="Quality not found")
-    
-    # Delete file from disk
-    file_path = os.path.join(QUALITIES_DIR, quality_info.filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
-    
-    # Delete from database
-    success = crud.delete_video_quality(db, quality_id)
-    if success:
-        return {"message": f"Quality '{quality_info.quality}' deleted successfully"}
-    else:
-        raise HTTPException(status_code=500, detail="Failed to delete quality from database")
-
-# ==========================
-# Trim video
-# ==========================
-@app.post("/trim")
-def trim_video(video_id: int, start_time: float, end_time: float, db: Session = Depends(get_db)):
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(404, detail="Video not found")
-
-    input_path = os.path.join(TEMP_DIR, video.filename)
-    if not os.path.exists(input_path):
-        raise HTTPException(404, detail="Video file not found on server")
-
-    out_filename = f"trimmed_{uuid.uuid4().hex}.mp4"
-    out_path = os.path.join(PROCESSED_DIR, out_filename)
-
-    cmd = [FFMPEG_PATH, "-i", input_path, "-ss", str(start_time), "-to", str(end_time), "-c", "copy", out_path]
-    subprocess.run(cmd, capture_output=True, text=True)
-
-    probe_cmd = [FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration,size", "-of", "json", out_path]
-    probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-    metadata = json.loads(probe_result.stdout)
-    duration = float(metadata["format"]["duration"])
-    size = int(metadata["format"]["size"])
-
-    trimmed = crud.create_trimmed_video(db, video_id=video.id, filename=out_filename, start_time=start_time, end_time=end_time, duration=duration, size=size)
-    return {"original_video_id": video.id, "trimmed_video_id": trimmed.id, "filename": out_filename, "duration": duration, "size": size}
-
-# ==========================
-# Download video
-# ==========================
-@app.get("/download/{filename}", response_class=FileResponse)
-def download_file(filename: str):
-    file_path = os.path.join(PROCESSED_DIR, filename)
-    if not os.path.exists(file_path):
-        raise HTTPException(404, detail="File not found")
-    return FileResponse(path=file_path, filename=filename, media_type="video/mp4")
-
-# ==========================
-# FFmpeg helper functions
-# ==========================
-def add_text_overlay(input_video, output_video, text, font_path, x, y, start, end, fontsize=30, fontcolor="white"):
-    cmd = [FFMPEG_PATH, "-i", input_video,
-           "-vf", f"drawtext=text='{text}':fontfile='{font_path}':x={x}:y={y}:fontsize={fontsize}:fontcolor={fontcolor}:enable='between(t,{start},{end})'",
-           "-codec:a", "copy", output_video]
-    subprocess.run(cmd, check=True)
-
-def add_image_overlay(input_video, output_video, image_path, x, y, start, end):
-    cmd = [FFMPEG_PATH, "-i", input_video, "-i", image_path,
-           "-filter_complex", f"overlay={x}:{y}:enable='between(t,{start},{end})'",
-           "-codec:a", "copy", output_video]
-    subprocess.run(cmd, check=True)
-
-def add_video_overlay(input_video, output_video, overlay_video, x, y, start, end):
-    cmd = [FFMPEG_PATH, "-i", input_video, "-i", overlay_video,
-           "-filter_complex", f"[1:v]setpts=PTS-STARTPTS+{start}/TB[ov];[0:v][ov]overlay={x}:{y}:enable='between(t,{start},{end})'",
-           "-codec:a", "copy", output_video]
-    subprocess.run(cmd, check=True)
-
-def add_watermark(input_video, output_video, watermark_path, x, y, opacity=0.5):
-    cmd = [FFMPEG_PATH, "-i", input_video, "-i", watermark_path,
-           "-filter_complex", f"[1]format=rgba,colorchannelmixer=aa={opacity}[wm];[0][wm]overlay={x}:{y}",
-           "-codec:a", "copy", output_video]
-    subprocess.run(cmd, check=True)
-
-# ==========================
-# Overlay / Watermark Endpoints
-# ==========================
-
-# Text Overlay
-@app.post("/overlay/text")
-async def overlay_text(
-    video_id: int, text: str, language: str = "hi", x: int = 100, y: int = 50,
-    start: float = 0, end: float = 5, fontsize: int = 30, fontcolor: str = "white",
-    db: Session = Depends(get_db)
-):
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(404, detail="Video not found")
-
-    input_path = os.path.join(TEMP_DIR, video.filename)
-    out_filename = f"overlay_text_{uuid.uuid4().hex}.mp4"
-    output_path = os.path.join(PROCESSED_DIR, out_filename)
-
-    font_map = {
-        "en": r"assets/fonts/NotoSans-Regular.ttf",
-        "hi": r"assets/fonts/NotoSansDevanagari-Regular.ttf",
-        "ta": r"assets/fonts/NotoSansTamil-Regular.ttf",
-        "te": r"assets/fonts/NotoSansTelugu-Regular.ttf"
-    }
-    font_path = font_map.get(language, r"assets/fonts/NotoSans-Regular.ttf")
-
-    add_text_overlay(input_path, output_path, text, font_path, x, y, start, end, fontsize, fontcolor)
-
-    overlay_op = crud.create_overlay(db, video.id, "text", out_filename)
-    crud.create_text_overlay(
-        db,
-        overlay_op.id,
-        text=text,
-        font_path=font_path,
-        fontsize=fontsize,
-        fontcolor=fontcolor,
-        language=language,
-        x=x,
-        y=y,
-        start=start,
-        end=end
-    )
-    return {"output_file": out_filename}
-
-# Image Overlay
-@app.post("/overlay/image")
-async def overlay_image(
-    video_id: int, image: UploadFile = File(...), x: int = 0, y: int = 0,
-    start: float = 0, end: float = 5, db: Session = Depends(get_db)
-):
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(404, detail="Video not found")
-
-    input_path = os.path.join(TEMP_DIR, video.filename)
-    out_filename = f"overlay_image_{uuid.uuid4().hex}.mp4"
-    output_path = os.path.join(PROCESSED_DIR, out_filename)
-
-    image_path = os.path.join(TEMP_DIR, f"{uuid.uuid4().hex}_{image.filename}")
-    with open(image_path, "wb") as f:
-        f.write(await image.read())
-
-    add_image_overlay(input_path, output_path, image_path, x, y, start, end)
-
-    overlay_op = crud.create_overlay(db, video.id, "image", out_filename)
-    crud.create_image_overlay(
-        db,
-        overlay_op.id,
-        image_path=image_path,
-        x=x,
-        y=y,
-        start=start,
-        end=end
-    )
-    return {"output_file": out_filename}
-
-# Video Overlay
-@app.post("/overlay/video")
-async def overlay_video(
-    video_id: int, overlay: UploadFile = File(...), x: int = 0, y: int = 0,
-    start: float = 0, end: float = 5, db: Session = Depends(get_db)
-):
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(404, detail="Video not found")
-
-    input_path = os.path.join(TEMP_DIR, video.filename)
-    out_filename = f"overlay_video_{uuid.uuid4().hex}.mp4"
-    output_path = os.path.join(PROCESSED_DIR, out_filename)
-
-    overlay_path = os.path.join(TEMP_DIR, f"{uuid.uuid4().hex}_{overlay.filename}")
-    with open(overlay_path, "wb") as f:
-        f.write(await overlay.read())
-
-    add_video_overlay(input_path, output_path, overlay_path, x, y, start, end)
-
-    overlay_op = crud.create_overlay(db, video.id, "video", out_filename)
-    crud.create_video_overlay(
-        db,
-        overlay_op.id,
-       overlay_video_path=overlay_path,
-        x=x,
-        y=y,
-        start=start,
-        end=end
-    )
-    return {"output_file": out_filename}
-
-# Watermark
-@app.post("/watermark/add")
-async def add_watermark_api(
-    video_id: int, watermark: UploadFile = File(...), x: int = 0, y: int = 0,
-    opacity: float = 0.5, db: Session = Depends(get_db)
-):
-    video = crud.get_video(db, video_id)
-    if not video:
-        raise HTTPException(404, detail="Video not found")
-
-    input_path = os.path.join(TEMP_DIR, video.filename)
-    out_filename = f"watermarked_{uuid.uuid4().hex}.mp4"
-    output_path = os.path.join(PROCESSED_DIR, out_filename)
-
-    watermark_path = os.path.join(TEMP_DIR, f"{uuid.uuid4().hex}_{watermark.filename}")
-    with open(watermark_path, "wb") as f:
-        f.write(await watermark.read())
-
-    add_watermark(input_path, output_path, watermark_path, x, y, opacity)
-
-    overlay_op = crud.create_overlay(db, video.id, "watermark", out_filename)
-    crud.create_watermark(
-        db,
-        overlay_op.id,
-        watermark_path=watermark_path,
-        x=x,
-        y=y,
-        opacity=opacity
-    )
-
-    #  Return response
-    return {"output_file": out_filename, "overlay_id": overlay_op.id}
\ No newline at end of file
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import asyncio, functools, hashlib, subprocess, os, json, shutil, secrets
+import aiofiles
+from pathlib import Path
+from typing import List, Optional
+from pydantic import BaseModel
+
+import crud, models, database
+from database import SessionLocal, AsyncSessionLocal, engine, Base
+
+# ==========================
+# DB setup
+# ==========================
+# Base.metadata.drop_all(bind=engine)
+Base.metadata.create_all(bind=engine)
+
+# ==========================
+# FastAPI app
+# ==========================
+app = FastAPI()
+
+# ==========================
+# FFmpeg paths
+# ==========================
+FFMPEG_PATH = r"C:\Users\VICTUS\ffmpeg\ffmpeg.exe"
+FFPROBE_PATH = r"C:\Users\VICTUS\ffmpeg\ffprobe.exe"
+
+# ==========================
+# Encoder selection
+# ==========================
+def _detect_encoder() -> str:
+    """Pick the H.264 encoder once at startup: env override first, then
+    h264_nvenc if this ffmpeg build has it, else the libx264 CPU path."""
+    encoder = os.getenv("VIDEO_ENCODER")
+    if encoder:
+        return encoder
+    try:
+        result = subprocess.run([FFMPEG_PATH, "-hide_banner", "-encoders"], capture_output=True, text=True)
+        if "h264_nvenc" in result.stdout:
+            return "h264_nvenc"
+    except OSError:
+        pass
+    return "libx264"
+
+ENCODER = _detect_encoder()
+app.state.encoder = ENCODER
+
+if ENCODER == "h264_nvenc":
+    # Hardware decode; frames come back to system memory so the CPU-side
+    # drawtext/overlay filters keep working.
+    HWACCEL_ARGS = ("-hwaccel", "cuda")
+    ENCODER_ARGS = ("-c:v", "h264_nvenc", "-preset", "p1", "-tune", "ll", "-rc", "vbr")
+else:
+    HWACCEL_ARGS = ()
+    ENCODER_ARGS = ("-c:v", "libx264", "-preset", "ultrafast")
+
+# ==========================
+# Directories
+# ==========================
+TEMP_DIR = Path("./temp_uploads")
+PROCESSED_DIR = Path("./processed")
+QUALITIES_DIR = Path("./qualities")  # NEW: Directory for quality versions
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+QUALITIES_DIR.mkdir(parents=True, exist_ok=True)  # NEW
+
+# ==========================
+# Fonts
+# ==========================
+FONT_MAP = {
+    "en": r"assets/fonts/NotoSans-Regular.ttf",
+    "hi": r"assets/fonts/NotoSansDevanagari-Regular.ttf",
+    "ta": r"assets/fonts/NotoSansTamil-Regular.ttf",
+    "te": r"assets/fonts/NotoSansTelugu-Regular.ttf"
+}
+DEFAULT_FONT = FONT_MAP["en"]
+
+@app.on_event("startup")
+def validate_fonts():
+    """Resolve and check every font once so overlay requests never stat the
+    filesystem; a missing font fails the app at boot instead of mid-encode."""
+    global DEFAULT_FONT
+    for language, font_path in FONT_MAP.items():
+        resolved = os.path.abspath(font_path)
+        if not os.path.isfile(resolved):
+            raise RuntimeError(f"Font for '{language}' not found: {resolved}")
+        FONT_MAP[language] = resolved
+    DEFAULT_FONT = FONT_MAP["en"]
+
+# ==========================
+# NEW: Pydantic Models for Video Quality
+# ==========================
+class QualityGenerationRequest(BaseModel):
+    qualities: List[str] = ["1080p", "720p", "480p"]
+
+class VideoQualityResponse(BaseModel):
+    id: int
+    video_id: int
+    quality: str
+    filename: str
+    bitrate: Optional[str]
+    resolution: Optional[str]
+    filesize: Optional[int]
+
+class OverlayOperationSpec(BaseModel):
+    type: str  # 'text', 'image', 'video' or 'watermark'
+    params: dict = {}
+
+class BatchOverlayRequest(BaseModel):
+    operations: List[OverlayOperationSpec]
+
+# ==========================
+# DB dependency
+# ==========================
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# ==========================
+# NEW: Video Quality Processing Functions
+# ==========================
+async def run_command(cmd: List[str]) -> str:
+    """Run a subprocess without blocking the event loop, returning its stdout"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(cmd[0])} failed: {stderr.decode(errors='ignore')}")
+    return stdout.decode()
+
+# Probe results keyed by (path, mtime_ns, size); lru_cache cannot wrap a
+# coroutine, so this is a plain dict with a crude size bound.
+_PROBE_CACHE: dict = {}
+
+async def probe_format(video_path: str) -> dict:
+    """ffprobe a file's format section, cached per (path, mtime, size)
+
+    Re-probing an unchanged file (e.g. re-trimming the same upload) is
+    answered from the cache without forking another ffprobe.
+    """
+    st = os.stat(video_path)
+    key = (video_path, st.st_mtime_ns, st.st_size)
+    cached = _PROBE_CACHE.get(key)
+    if cached is None:
+        cmd = [FFPROBE_PATH, "-v", "error", "-show_entries", "format=duration,size", "-of", "json", video_path]
+        cached = json.loads(await run_command(cmd))["format"]
+        if len(_PROBE_CACHE) >= 512:
+            _PROBE_CACHE.clear()
+        _PROBE_CACHE[key] = cached
+    return cached
+
+QUALITY_SETTINGS = {
+    "1080p": {"resolution": "1920x1080", "bitrate": "5000k", "crf": "23"},
+    "720p": {"resolution": "1280x720", "bitrate": "2500k", "crf": "25"},
+    "480p": {"resolution": "854x480", "bitrate": "1000k", "crf": "28"},
+}
+
+# Precompiled per-quality argv fragments so the hot path only does a dict
+# lookup and tuple splice instead of rebuilding the same strings per call.
+QUALITY_SCALE_FILTERS = {
+    quality: f"scale={settings['resolution'].replace('x', ':')}"
+    for quality, settings in QUALITY_SETTINGS.items()
+}
+QUALITY_FFMPEG_ARGS = {
+    quality: (
+        "-b:v", settings["bitrate"],
+        "-crf", settings["crf"],
+        "-preset", "fast",
+        "-c:a", "aac", "-b:a", "128k",
+    )
+    for quality, settings in QUALITY_SETTINGS.items()
+}
+
+async def encode_quality_renditions(input_path: str, outputs: List[tuple]) -> dict:
+    """Generate several quality versions of a video with one ffmpeg invocation
+
+    The source is decoded once and split into one scaler per rendition,
+    instead of re-decoding the input for every quality.
+
+    Args:
+        outputs: list of (quality, output_path) pairs
+
+    Returns:
+        dict mapping quality -> metadata dict
+    """
+    for quality, _ in outputs:
+        if quality not in QUALITY_SETTINGS:
+            raise ValueError(f"Unsupported quality: {quality}")
+
+    split_labels = "".join(f"[v{i}]" for i in range(len(outputs)))
+    graph = f"[0:v]split={len(outputs)}{split_labels};" + ";".join(
+        f"[v{i}]{QUALITY_SCALE_FILTERS[quality]}[o{i}]"
+        for i, (quality, _) in enumerate(outputs)
+    )
+
+    cmd = [FFMPEG_PATH, "-i", input_path, "-filter_complex", graph]
+    for i, (quality, output_path) in enumerate(outputs):
+        cmd += ["-map", f"[o{i}]", "-map", "0:a?", *QUALITY_FFMPEG_ARGS[quality], output_path]
+
+    await run_command(cmd)
+
+    # Resolution and bitrate are fixed by the requested settings, so probing
+    # the outputs with ffprobe would only re-read what we already know.
+    metadata = {}
+    for quality, output_path in outputs:
+        settings = QUALITY_SETTINGS[quality]
+        metadata[quality] = {
+            "resolution": settings["resolution"],
+            "bitrate": settings["bitrate"],
+            "filesize": os.path.getsize(output_path)
+        }
+    return metadata
+
+async def generate_video_quality(input_path: str, output_path: str, quality: str) -> dict:
+    """Generate a specific quality version of a video"""
+    results = await encode_quality_renditions(input_path, [(quality, output_path)])
+    return results[quality]
+
+async def process_video_qualities(video_id: int, original_filename: str, qualities: List[str]):
+    """Background task to process video qualities"""
+    try:
+        input_path = str(TEMP_DIR / original_filename)
+        # Skip unknown rungs instead of aborting the batch; the generate
+        # endpoint rejects them up front, so this only guards direct calls.
+        for quality in qualities:
+            if quality not in QUALITY_SETTINGS:
+                print(f"Skipping unsupported quality '{quality}' for video {video_id}")
+        qualities = [q for q in qualities if q in QUALITY_SETTINGS]
+        outputs = [(quality, f"{quality}_{secrets.token_hex(16)}.mp4") for quality in qualities]
+
+        # One ffmpeg run decodes the source once and emits every rendition.
+        try:
+            results = await encode_quality_renditions(
+                input_path,
+                [(quality, str(QUALITIES_DIR / output_filename)) for quality, output_filename in outputs]
+            )
+        except Exception as e:
+            print(f"Failed to generate qualities for video {video_id}: {str(e)}")
+            results = {}
+
+        qualities_data = []
+        for quality, output_filename in outputs:
+            metadata = results.get(quality)
+            if metadata is None:
+                continue
+            qualities_data.append({
+                "quality": quality,
+                "filename": output_filename,
+                "bitrate": metadata["bitrate"],
+                "resolution": metadata["resolution"],
+                "filesize": metadata["filesize"]
+            })
+
+        # Save to database. The request-scoped session is closed once the
+        # response is sent, so the task opens its own short-lived one here —
+        # no pooled connection is held for the duration of the encode.
+        if qualities_data:
+            with SessionLocal() as db:
+                crud.create_multiple_video_qualities(db, video_id, qualities_data)
+            print(f"Successfully generated {len(qualities_data)} quality versions for video {video_id}")
+    
+    except Exception as e:
+        print(f"Error processing qualities for video {video_id}: {str(e)}")
+
+# ==========================
+# Cleanup database
+# ==========================
+def cleanup_database():
+    db = SessionLocal()
+    try:
+        videos = db.query(models.Video).all()
+        for video in videos:
+            current_path = str(TEMP_DIR / video.filename)
+            if not os.path.exists(current_path):
+                for file in os.listdir(TEMP_DIR):
+                    if file.endswith(video.filename) or video.filename in file:
+                        video.filename = file
+                        break
+        db.commit()
+    except Exception as e:
+        print(f"Cleanup error: {e}")
+    finally:
+        db.close()
+
+cleanup_database()
+
+# ==========================
+# Root
+# ==========================
+@app.get("/")
+def root():
+    return {"msg": "Video API is running 🚀"}
+
+# ==========================
+# Upload video
+# ==========================
+@app.post("/upload")
+async def upload(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    if not file.content_type.startswith("video/"):
+        raise HTTPException(400, detail="File must be a video")
+    try:
+        unique_filename = f"{secrets.token_hex(16)}_{file.filename}"
+        file_path = str(TEMP_DIR / unique_filename)
+        # Stream to disk in 4 MB chunks; a synchronous copyfileobj would
+        # block the event loop for the duration of the whole upload.
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(1 << 22):
+                await buffer.write(chunk)
+
+        metadata = await probe_format(file_path)
+        duration = float(metadata.get("duration", 0))
+        size = int(metadata.get("size", 0))
+
+        db_video = crud.create_video(db, filename=unique_filename, duration=duration, size=size)
+        return {"id": db_video.id, "filename": file.filename, "stored_filename": unique_filename, "duration": duration, "size": size}
+    except Exception as e:
+        raise HTTPException(500, detail=str(e))
+
+# ==========================
+# List videos
+# ==========================
+@app.get("/videos")
+def list_videos(db: Session = Depends(get_db)):
+    videos = crud.get_videos_summary(db)
+    return [
+        {
+            "id": row.id,
+            "filename": row.filename,
+            "original_filename": row.filename.split('_', 1)[1] if '_' in row.filename else row.filename,
+            "duration": row.duration,
+            "size": row.size,
+            "upload_time": row.upload_time
+        }
+        for row in videos
+    ]
+
+# ==========================
+# NEW: Video Quality Endpoints
+# ==========================
+
+@app.post("/videos/{video_id}/qualities/generate")
+async def generate_video_qualities(
+    video_id: int,
+    request: QualityGenerationRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Generate multiple quality versions of a video"""
+    unsupported = [q for q in request.qualities if q not in QUALITY_SETTINGS]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported qualities: {', '.join(unsupported)}")
+
+    video = crud.get_video(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    input_path = str(TEMP_DIR / video.filename)
+    if not os.path.exists(input_path):
+        raise HTTPException(status_code=404, detail="Video file not found on server")
+    
+    # Check if qualities already exist (one query, reused for the response)
+    existing_qualities = {q.quality for q in crud.get_video_qualities(db, video_id)}
+    new_qualities = [q for q in request.qualities if q not in existing_qualities]
+
+    if not new_qualities:
+        return {"message": "All requested qualities already exist", "existing_qualities": sorted(existing_qualities)}
+    
+    # Start background processing
+    background_tasks.add_task(process_video_qualities, video_id, video.filename, new_qualities)
+    
+    return {
+        "message": f"Started generating {len(new_qualities)} quality versions",
+        "video_id": video_id,
+        "requested_qualities": new_qualities,
+        "existing_qualities": sorted(existing_qualities)
+    }
+
+@app.get("/videos/{video_id}/qualities")
+def get_video_qualities(video_id: int, db: Session = Depends(get_db)):
+    """Get all available quality versions for a video"""
+    video = crud.get_video(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    qualities = crud.get_video_qualities(db, video_id)
+    return {
+        "video_id": video_id,
+        "original_filename": video.filename,
+        "available_qualities": [
+            {
+                "id": q.id,
+                "quality": q.quality,
+                "filename": q.filename,
+                "bitrate": q.bitrate,
+                "resolution": q.resolution,
+                "filesize": q.filesize,
+                "created_time": q.created_time
+            }
+            for q in qualities
+        ]
+    }
+
+@app.get("/videos/{video_id}/qualities/{quality}")
+def get_specific_quality(video_id: int, quality: str, db: Session = Depends(get_db)):
+    """Get information about a specific quality version"""
+    video = crud.get_video(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    quality_info = crud.get_video_by_quality(db, video_id, quality)
+    if not quality_info:
+        raise HTTPException(status_code=404, detail=f"Quality '{quality}' not found for this video")
+    
+    return {
+        "id": quality_info.id,
+        "video_id": video_id,
+        "quality": quality_info.quality,
+        "filename": quality_info.filename,
+        "bitrate": quality_info.bitrate,
+        "resolution": quality_info.resolution,
+        "filesize": quality_info.filesize,
+        "created_time": quality_info.created_time
+    }
+
+@app.get("/videos/{video_id}/download/{quality}")
+def download_quality(video_id: int, quality: str, db: Session = Depends(get_db)):
+    """Download a specific quality version of a video"""
+    video = crud.get_video(db, video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    quality_info = crud.get_video_by_quality(db, video_id, quality)
+    if not quality_info:
+        raise HTTPException(status_code=404, detail=f"Quality '{quality}' not found for this video")
+    
+    file_path = str(QUALITIES_DIR / quality_info.filename)
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Quality file not found on server")
+
+    # Generate a user-friendly filename
+    original_name = video.filename.split('_', 1)[1] if '_' in video.filename else video.filename
+    download_name = f"{original_name.rsplit('.', 1)[0]}_{quality}.mp4"
+
+    # Passing the stat lets FileResponse skip its own stat; the transfer
+    # itself goes through sendfile under uvicorn. Advertising byte ranges
+    # lets players seek without downloading the whole file.
+    return FileResponse(
+        path=file_path,
+        filename=download_name,
+        media_type="video/mp4",
+        stat_result=stat_result,
+        headers={"Accept-Ranges": "bytes"}
+    )
+
+@app.get("/videos/{video_id}/stats")
+def get_video_stats(video_id: int, db: Session = Depends(get_db)):
+    """Get comprehensive statistics for a video"""
+    stats = crud.get_video_stats(db, video_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    return stats
+
+@app.delete("/videos/{video_id}/qualities/{quality_id}")
+def delete_video_quality(video_id: int, quality_id: int, db: Session = Depends(get_db)):
+    """Delete a specific quality version"""
+    quality_info = crud.get_quality_by_id(db, quality_id)
+    if not quality_info or quality_info.video_id != video_id:
+        raise HTTPException(status_code=404, detail="Quality not found")
+
+    # Capture before the delete: the bulk DELETE's commit expires the
+    # instance, and refreshing a removed row would raise.
+    quality_name = quality_info.quality
+    file_path = str(QUALITIES_DIR / quality_info.filename)
+
+    # Delete file from disk
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    
+    # Delete from database
+    success = crud.delete_video_quality(db, quality_id)
+    if success:
+        return {"message": f"Quality '{quality_name}' deleted successfully"}
+    else:
+        raise HTTPException(status_code=500, detail="Failed to delete quality from database")
+
+# ==========================
+# Trim video
+# ==========================
+@app.post("/trim")
+async def trim_video(video_id: int, start_time: float, end_time: float, db: Session = Depends(get_db)):
+    video = crud.get_video(db, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    input_path = str(TEMP_DIR / video.filename)
+    if not os.path.exists(input_path):
+        raise HTTPException(404, detail="Video file not found on server")
+
+    out_filename = f"trimmed_{secrets.token_hex(16)}.mp4"
+    out_path = str(PROCESSED_DIR / out_filename)
+
+    cmd = [FFMPEG_PATH, "-i", input_path, "-ss", str(start_time), "-to", str(end_time), "-c", "copy", out_path]
+    await run_command(cmd)
+
+    metadata = await probe_format(out_path)
+    duration = float(metadata["duration"])
+    size = int(metadata["size"])
+
+    trimmed = crud.create_trimmed_video(db, video_id=video.id, filename=out_filename, start_time=start_time, end_time=end_time, duration=duration, size=size)
+    return {"original_video_id": video.id, "trimmed_video_id": trimmed.id, "filename": out_filename, "duration": duration, "size": size}
+
+# ==========================
+# Download video
+# ==========================
+@app.get("/download/{filename}", response_class=FileResponse)
+def download_file(filename: str):
+    file_path = str(PROCESSED_DIR / filename)
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(404, detail="File not found")
+    return FileResponse(path=file_path, filename=filename, media_type="video/mp4",
+                        stat_result=stat_result, headers={"Accept-Ranges": "bytes"})
+
+# ==========================
+# FFmpeg helper functions
+# ==========================
+# Characters that terminate or corrupt a single-quoted drawtext value
+# unless escaped, per ffmpeg's filter quoting rules.
+_DRAWTEXT_ESCAPES = str.maketrans({"\\": "\\\\", "'": "\\'", ":": "\\:", "%": "\\%"})
+
+def ffmpeg_escape_text(text: str) -> str:
+    """Escape user text for embedding in a drawtext filter value"""
+    return text.translate(_DRAWTEXT_ESCAPES)
+
+@functools.lru_cache(maxsize=16)
+def _drawtext_template(font_path: str, fontsize: int, fontcolor: str) -> str:
+    """Drawtext skeleton for one font/size/color combination
+
+    The font triple rarely varies (one entry per language in practice),
+    so the constant half of the filter string is built once and only the
+    text/position/timing fields are formatted per call.
+    """
+    return (
+        f"drawtext=fontfile='{font_path}':fontsize={fontsize}:fontcolor={fontcolor}:"
+        "text='{text}':x={x}:y={y}:enable='between(t,{start},{end})'"
+    )
+
+def build_overlay_filter(operations: List[dict]):
+    """Compose overlay operations into a single filter_complex graph
+
+    Each operation dict carries a 'type' key ('text', 'image', 'video' or
+    'watermark') plus its parameters; file-based types carry 'asset_path'.
+
+    Returns (extra_inputs, graph, output_label).
+    """
+    extra_inputs = []
+    steps = []
+    current = "0:v"
+    for i, op in enumerate(operations):
+        label = f"s{i}"
+        op_type = op["type"]
+        if op_type == "text":
+            drawtext = _drawtext_template(
+                op["font_path"], op["fontsize"], op["fontcolor"]
+            ).format(
+                text=ffmpeg_escape_text(op["text"]),
+                x=op["x"], y=op["y"], start=op["start"], end=op["end"]
+            )
+            steps.append(f"[{current}]{drawtext}[{label}]")
+        elif op_type == "image":
+            idx = len(extra_inputs) + 1
+            extra_inputs.append(op["asset_path"])
+            steps.append(
+                f"[{current}][{idx}:v]overlay={op['x']}:{op['y']}:"
+                f"enable='between(t,{op['start']},{op['end']})'[{label}]"
+            )
+        elif op_type == "video":
+            idx = len(extra_inputs) + 1
+            extra_inputs.append(op["asset_path"])
+            steps.append(
+                f"[{idx}:v]setpts=PTS-STARTPTS+{op['start']}/TB[ov{i}];"
+                f"[{current}][ov{i}]overlay={op['x']}:{op['y']}:"
+                f"enable='between(t,{op['start']},{op['end']})'[{label}]"
+            )
+        elif op_type == "watermark":
+            idx = len(extra_inputs) + 1
+            extra_inputs.append(op["asset_path"])
+            steps.append(
+                f"[{idx}:v]format=rgba,colorchannelmixer=aa={op['opacity']}[wm{i}];"
+                f"[{current}][wm{i}]overlay={op['x']}:{op['y']}[{label}]"
+            )
+        else:
+            raise ValueError(f"Unsupported overlay type: {op_type}")
+        current = label
+    return extra_inputs, ";".join(steps), current
+
+# Assets up to this size are staged in memory before touching the disk.
+SMALL_ASSET_LIMIT = 8 << 20
+
+async def save_upload_dedup(upload: UploadFile):
+    """Persist an upload into TEMP_DIR, deduplicated by content hash
+
+    The final name is derived from a BLAKE2 digest of the bytes, so
+    re-uploading the same logo/watermark reuses the existing file
+    (already hot in page cache) instead of writing a fresh copy.
+
+    Small assets are buffered and hashed in memory first: a re-upload
+    of a known asset is recognized without any disk I/O, and a new one
+    is written in a single call. Larger uploads stream through a temp
+    file, hashing as they go.
+
+    Returns (path, hexdigest).
+    """
+    ext = os.path.splitext(upload.filename or "")[1]
+    hasher = hashlib.blake2b(digest_size=16)
+    buffered = bytearray()
+    while len(buffered) <= SMALL_ASSET_LIMIT and (chunk := await upload.read(1 << 20)):
+        buffered += chunk
+
+    if len(buffered) <= SMALL_ASSET_LIMIT:
+        hasher.update(buffered)
+        digest = hasher.hexdigest()
+        final_path = str(TEMP_DIR / f"{digest}{ext}")
+        if not os.path.exists(final_path):
+            tmp_path = str(TEMP_DIR / f"incoming_{secrets.token_hex(16)}{ext}")
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(bytes(buffered))
+            os.replace(tmp_path, final_path)
+        return final_path, digest
+
+    hasher.update(buffered)
+    tmp_path = str(TEMP_DIR / f"incoming_{secrets.token_hex(16)}{ext}")
+    async with aiofiles.open(tmp_path, "wb") as f:
+        await f.write(bytes(buffered))
+        while chunk := await upload.read(1 << 20):
+            hasher.update(chunk)
+            await f.write(chunk)
+    digest = hasher.hexdigest()
+    final_path = str(TEMP_DIR / f"{digest}{ext}")
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, final_path)
+    return final_path, digest
+
+async def normalize_overlay_video(asset_path: str) -> str:
+    """Normalize an overlay video once per deduped asset
+
+    Uploaded overlays arrive in arbitrary codecs and pixel formats, so
+    every overlay against them pays a fresh decode plus color-space
+    conversion. Re-encoding once to yuv420p H.264 capped at 1920 wide
+    (named after the asset, so the dedup cache covers it) makes every
+    later overlay against the same asset a cheap decode.
+    """
+    stem, _ = os.path.splitext(asset_path)
+    norm_path = f"{stem}_norm.mp4"
+    if not os.path.exists(norm_path):
+        cmd = [
+            FFMPEG_PATH, "-i", asset_path,
+            "-vf", "scale='min(1920,iw)':-2", "-pix_fmt", "yuv420p",
+            *ENCODER_ARGS, "-an", norm_path
+        ]
+        await run_command(cmd)
+    return norm_path
+
+def overlay_cache_key(video_id: int, op_type: str, params: dict, asset_hash: str = "") -> str:
+    """Cache key for an overlay result: same base video, same parameters and
+    same asset bytes always yield the same output file."""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(
+        f"{video_id}|{op_type}|{canonical}|{asset_hash}".encode(), digest_size=16
+    ).hexdigest()
+
+async def cached_overlay_output(db: AsyncSession, params_key: str) -> Optional[str]:
+    """Return the output filename of a previous identical overlay, if the
+    row exists and the file is still on disk."""
+    cached = await crud.get_overlay_by_params_hash(db, params_key)
+    if cached and os.path.exists(str(PROCESSED_DIR / cached.filename)):
+        return cached.filename
+    return None
+
+def copy_passthrough(src: str, dst: str):
+    """Publish src under dst without re-encoding or userspace buffering
+
+    A hardlink is free and doubles as caching when both directories sit
+    on one filesystem. Failing that, sendfile copies kernel-side without
+    bouncing the bytes through Python; shutil.copyfile is the last
+    resort for filesystems where sendfile is unavailable.
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            offset = 0
+            remaining = os.fstat(s.fileno()).st_size
+            while remaining > 0:
+                sent = os.sendfile(d.fileno(), s.fileno(), offset, remaining)
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def is_noop_overlay(op: dict) -> bool:
+    """An overlay whose time window is empty (or a fully transparent
+    watermark) cannot change a single pixel, so the encode can be skipped."""
+    if op["type"] == "watermark":
+        return op["opacity"] == 0.0
+    return op["end"] <= op["start"]
+
+async def run_overlay_pipeline(input_path: str, output_path: str, operations: List[dict]):
+    """Apply any number of overlays with one decode and one encode
+
+    Operations that provably cannot alter the output are dropped up
+    front; if nothing remains, the source is passed through untouched.
+    """
+    operations = [op for op in operations if not is_noop_overlay(op)]
+    if not operations:
+        await asyncio.to_thread(copy_passthrough, input_path, output_path)
+        return
+    extra_inputs, graph, out_label = build_overlay_filter(operations)
+    cmd = [FFMPEG_PATH, *HWACCEL_ARGS, "-i", input_path]
+    for path in extra_inputs:
+        cmd += ["-i", path]
+    cmd += ["-filter_complex", graph, "-map", f"[{out_label}]", "-map", "0:a?",
+            *ENCODER_ARGS, "-codec:a", "copy", output_path]
+    await run_command(cmd)
+
+# ==========================
+# Overlay / Watermark Endpoints
+# ==========================
+
+# Output filename prefix per operation type (watermark keeps its
+# historical name for existing clients).
+OVERLAY_OUT_PREFIX = {
+    "text": "overlay_text",
+    "image": "overlay_image",
+    "video": "overlay_video",
+    "watermark": "watermarked",
+}
+
+async def _run_overlay(db: AsyncSession, video, op_type: str, cache_params: dict,
+                       pipeline_op: dict, detail, asset_hash: str = ""):
+    """Shared sequence behind the single-overlay routes
+
+    Consults the params-hash cache, runs the fused pipeline on a miss,
+    and records the operation with its detail row. The routes stay thin:
+    they only resolve their asset/font and build the detail instance.
+    Returns (output filename, overlay operation row).
+    """
+    input_path = str(TEMP_DIR / video.filename)
+    params_key = overlay_cache_key(video.id, op_type, cache_params, asset_hash=asset_hash)
+    out_filename = await cached_overlay_output(db, params_key)
+    if out_filename is None:
+        out_filename = f"{OVERLAY_OUT_PREFIX[op_type]}_{secrets.token_hex(16)}.mp4"
+        output_path = str(PROCESSED_DIR / out_filename)
+        await run_overlay_pipeline(input_path, output_path, [pipeline_op])
+    overlay_op = await crud.create_overlay_with_detail(
+        db, video.id, op_type, out_filename, detail, params_hash=params_key
+    )
+    return out_filename, overlay_op
+
+# Text Overlay
+@app.post("/overlay/text")
+async def overlay_text(
+    video_id: int, text: str, language: str = "hi", x: int = 100, y: int = 50,
+    start: float = 0, end: float = 5, fontsize: int = 30, fontcolor: str = "white",
+    db: AsyncSession = Depends(get_async_db)
+):
+    video = await crud.get_video_async(db, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    font_path = FONT_MAP.get(language, DEFAULT_FONT)
+    out_filename, _ = await _run_overlay(
+        db, video, "text",
+        cache_params={
+            "text": text, "language": language, "x": x, "y": y,
+            "start": start, "end": end, "fontsize": fontsize, "fontcolor": fontcolor
+        },
+        pipeline_op={
+            "type": "text", "text": text, "font_path": font_path,
+            "x": x, "y": y, "start": start, "end": end,
+            "fontsize": fontsize, "fontcolor": fontcolor
+        },
+        detail=models.TextOverlay(
+            text_content=text, font_path=font_path, font_size=fontsize,
+            font_color=fontcolor, language=language, x_position=x,
+            y_position=y, start_time=start, end_time=end
+        )
+    )
+    return {"output_file": out_filename}
+
+# Image Overlay
+@app.post("/overlay/image")
+async def overlay_image(
+    video_id: int, image: UploadFile = File(...), x: int = 0, y: int = 0,
+    start: float = 0, end: float = 5, db: AsyncSession = Depends(get_async_db)
+):
+    video = await crud.get_video_async(db, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    image_path, image_hash = await save_upload_dedup(image)
+    out_filename, _ = await _run_overlay(
+        db, video, "image",
+        cache_params={"x": x, "y": y, "start": start, "end": end},
+        pipeline_op={
+            "type": "image", "asset_path": image_path,
+            "x": x, "y": y, "start": start, "end": end
+        },
+        detail=models.ImageOverlay(
+            image_path=image_path, content_hash=image_hash, x_position=x,
+            y_position=y, start_time=start, end_time=end
+        ),
+        asset_hash=image_hash
+    )
+    return {"output_file": out_filename}
+
+# Video Overlay
+@app.post("/overlay/video")
+async def overlay_video(
+    video_id: int, overlay: UploadFile = File(...), x: int = 0, y: int = 0,
+    start: float = 0, end: float = 5, db: AsyncSession = Depends(get_async_db)
+):
+    video = await crud.get_video_async(db, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    overlay_path, overlay_hash = await save_upload_dedup(overlay)
+    overlay_path = await normalize_overlay_video(overlay_path)
+    out_filename, _ = await _run_overlay(
+        db, video, "video",
+        cache_params={"x": x, "y": y, "start": start, "end": end},
+        pipeline_op={
+            "type": "video", "asset_path": overlay_path,
+            "x": x, "y": y, "start": start, "end": end
+        },
+        detail=models.VideoOverlay(
+            overlay_video_path=overlay_path, content_hash=overlay_hash,
+            x_position=x, y_position=y, start_time=start, end_time=end
+        ),
+        asset_hash=overlay_hash
+    )
+    return {"output_file": out_filename}
+
+# Watermark
+@app.post("/watermark/add")
+async def add_watermark_api(
+    video_id: int, watermark: UploadFile = File(...), x: int = 0, y: int = 0,
+    opacity: float = 0.5, db: AsyncSession = Depends(get_async_db)
+):
+    video = await crud.get_video_async(db, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+
+    watermark_path, watermark_hash = await save_upload_dedup(watermark)
+    out_filename, overlay_op = await _run_overlay(
+        db, video, "watermark",
+        cache_params={"x": x, "y": y, "opacity": opacity},
+        pipeline_op={
+            "type": "watermark", "asset_path": watermark_path,
+            "x": x, "y": y, "opacity": opacity
+        },
+        detail=models.Watermark(
+            watermark_path=watermark_path, content_hash=watermark_hash,
+            x_position=x, y_position=y, opacity=opacity
+        ),
+        asset_hash=watermark_hash
+    )
+    return {"output_file": out_filename, "overlay_id": overlay_op.id}
+
+# Batch overlays: every requested operation is fused into one ffmpeg
+# filter graph, so chained text/image/watermark edits cost one decode
+# and one encode instead of one full transcode per operation.
+@app.post("/overlay/batch")
+async def overlay_batch(
+    video_id: int, request: BatchOverlayRequest, db: AsyncSession = Depends(get_async_db)
+):
+    video = await crud.get_video_async(db, video_id)
+    if not video:
+        raise HTTPException(404, detail="Video not found")
+    if not request.operations:
+        raise HTTPException(400, detail="No overlay operations given")
+
+    input_path = str(TEMP_DIR / video.filename)
+
+    operations = []
+    for spec in request.operations:
+        params = spec.params
+        op = {
+            "type": spec.type,
+            "x": params.get("x", 0),
+            "y": params.get("y", 0),
+            "start": params.get("start", 0),
+            "end": params.get("end", 5),
+        }
+        if spec.type == "text":
+            if "text" not in params:
+                raise HTTPException(400, detail="Text overlay requires 'text'")
+            op["text"] = params["text"]
+            op["language"] = params.get("language", "hi")
+            op["font_path"] = FONT_MAP.get(op["language"], DEFAULT_FONT)
+            op["fontsize"] = params.get("fontsize", 30)
+            op["fontcolor"] = params.get("fontcolor", "white")
+        elif spec.type in ("image", "video", "watermark"):
+            asset_filename = params.get("asset_filename")
+            if not asset_filename:
+                raise HTTPException(400, detail=f"{spec.type} overlay requires 'asset_filename'")
+            asset_path = str(TEMP_DIR / os.path.basename(asset_filename))
+            if not os.path.exists(asset_path):
+                raise HTTPException(404, detail=f"Asset '{asset_filename}' not found on server")
+            if spec.type == "video":
+                asset_path = await normalize_overlay_video(asset_path)
+            op["asset_path"] = asset_path
+            if spec.type == "watermark":
+                op["opacity"] = params.get("opacity", 0.5)
+        else:
+            raise HTTPException(400, detail=f"Unsupported overlay type: {spec.type}")
+        operations.append(op)
+
+    # The dedup'd asset paths encode their content hash, so hashing the
+    # resolved operation list covers parameter and asset identity alike.
+    params_key = overlay_cache_key(video.id, "batch", {"operations": operations})
+    out_filename = await cached_overlay_output(db, params_key)
+    if out_filename is None:
+        out_filename = f"overlay_batch_{secrets.token_hex(16)}.mp4"
+        output_path = str(PROCESSED_DIR / out_filename)
+        await run_overlay_pipeline(input_path, output_path, operations)
+
+    # One master operation row; each constituent is stored as its detail
+    # row, all inserted in a single transaction.
+    details = []
+    for op in operations:
+        if op["type"] == "text":
+            details.append(models.TextOverlay(
+                text_content=op["text"], font_path=op["font_path"],
+                font_size=op["fontsize"], font_color=op["fontcolor"],
+                language=op["language"], x_position=op["x"], y_position=op["y"],
+                start_time=op["start"], end_time=op["end"]
+            ))
+        elif op["type"] == "image":
+            details.append(models.ImageOverlay(
+                image_path=op["asset_path"], x_position=op["x"], y_position=op["y"],
+                start_time=op["start"], end_time=op["end"]
+            ))
+        elif op["type"] == "video":
+            details.append(models.VideoOverlay(
+                overlay_video_path=op["asset_path"], x_position=op["x"], y_position=op["y"],
+                start_time=op["start"], end_time=op["end"]
+            ))
+        elif op["type"] == "watermark":
+            details.append(models.Watermark(
+                watermark_path=op["asset_path"], x_position=op["x"], y_position=op["y"],
+                opacity=op["opacity"]
+            ))
+    op_type = "batch" if len(operations) > 1 else operations[0]["type"]
+    overlay_op = await crud.create_overlay_with_detail(
+        db, video.id, op_type, out_filename, details, params_hash=params_key
+    )
+    return {"output_file": out_filename, "overlay_id": overlay_op.id, "operations": len(operations)}